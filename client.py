@@ -17,27 +17,32 @@ import argparse
 import sys
 
 def recv_loop(sock):
+    # buffered reader does the line splitting; lines are passed through undecoded
+    rf = sock.makefile('rb', buffering=65536)
     try:
-        while True:
-            data = sock.recv(4096)
-            if not data:
-                print("[*] Server closed connection.")
-                return
+        for line in rf:
             # print server lines as-is
-            sys.stdout.write(data.decode('utf-8'))
-            if not data.decode('utf-8').endswith("\n"):
-                sys.stdout.write("\n")
+            sys.stdout.buffer.write(line)
+            if not line.endswith(b"\n"):
+                sys.stdout.buffer.write(b"\n")
             sys.stdout.flush()
+        print("[*] Server closed connection.")
     except Exception:
         print("[*] Disconnected.")
     finally:
         try:
+            rf.close()
             sock.close()
         except Exception:
             pass
 
 def main(host, port):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # send each typed command immediately instead of waiting on Nagle
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
     sock.connect((host, port))
     print(f"[+] Connected to {host}:{port}")
     t = threading.Thread(target=recv_loop, args=(sock,), daemon=True)
@@ -2,7 +2,7 @@
 """
 Simple Socket Chat Server
 - Listens on port 4000 by default (configurable).
-- Uses only Python standard library.
+- Uses only Python standard library (runs on uvloop instead if it is installed).
 - Supports LOGIN, MSG, WHO, DM, PING, and idle timeout (60s).
 Protocol examples:
   LOGIN Alice
@@ -17,267 +17,634 @@ Protocol examples:
   -> PONG
 When a user disconnects:
   INFO <username> disconnected
+With --workers N the server forks N processes that share the port through
+SO_REUSEPORT. The parent relays broadcasts, DMs and logins between them.
 """
+import asyncio
 import socket
-import threading
 import argparse
 import os
+import sys
 import time
 import traceback
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configuration
 DEFAULT_PORT = 4000
 IDLE_TIMEOUT = 60  # seconds
+RECV_BUFFER_SIZE = int(os.environ.get("CHAT_RECV_BUFFER", 8192))  # bytes, per connection
+# Give a receive buffer that grew for a long line back once it has drained.
+# Set CHAT_BUFFER_RELAX=0 to keep grown buffers until the connection closes.
+BUFFER_RELAX = os.environ.get("CHAT_BUFFER_RELAX", "1") != "0"
+MAX_LINE = 65536  # longest line accepted from a client, newline excluded
+# longest line the worker relay accepts; a relayed DM carries the target, the
+# sender and the text, each at most MAX_LINE
+HUB_LINE_LIMIT = 4 * MAX_LINE
+COMPACT_THRESHOLD = 4096  # move the unparsed tail to the front once this much is consumed
+STATE_POOL_SIZE = 1024  # closed ClientState objects kept for reuse
+SOCKET_BUFFER_SIZE = 65536  # SO_SNDBUF / SO_RCVBUF for client sockets
+MAX_PENDING_BYTES = 1024 * 1024  # unsent output a client may build up before it is dropped
+WHEEL_SIZE = 64  # idle-timeout timing wheel slots, one per second; keep > IDLE_TIMEOUT
 
 # Global client structures
-clients_lock = threading.Lock()
-# username -> {"conn": socket, "addr": (host,port), "last_active": float}
+# Usernames and protocol lines are handled as UTF-8 bytes throughout; the
+# server forwards text without ever decoding it.
+# All connections are served by a single asyncio event loop, so these are only
+# ever touched from one thread and need no locking.
+# username -> ClientState
 clients = {}
-# conn.fileno() -> username (for quick lookup)
-conn_to_username = {}
+# Immutable ((username, ClientState), ...) copy of clients, rebuilt on every
+# login/disconnect. Readers (broadcast, WHO) iterate it without copying, and a
+# login or disconnect triggered part-way through can't change it under them.
+_clients_snapshot = ()
+# Encoded WHO reply for the current snapshot; None until the next WHO rebuilds it
+_who_payload = None
+# Idle-timeout timing wheel: _wheel[s % WHEEL_SIZE] holds the logged-in clients
+# due to be checked in second s. Activity only bumps last_active; a client whose
+# slot comes up while still active is moved to the slot of its new deadline.
+_wheel = [set() for _ in range(WHEEL_SIZE)]
+# Closed ClientState objects (and their receive buffers) waiting to be reused
+_state_pool = []
+# Multi-worker mode only: transport to the parent's relay, and usernames
+# logged in on the other workers
+_hub = None
+remote_users = set()
 
 # Helper functions
 def now():
-    return time.time()
+    return time.monotonic()
 
-def send_line(conn, line):
+def tune_socket(sock):
+    """Disable Nagle so short replies (OK, PONG) go out immediately, and size the kernel buffers."""
     try:
-        if not line.endswith("\n"):
-            line = line + "\n"
-        conn.sendall(line.encode('utf-8'))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except OSError:
+        pass
+
+def send_bytes(transport, payload):
+    """
+    Queue payload on transport. The transport sends what the kernel will take
+    right away and keeps the rest until the socket is writable again.
+    """
+    try:
+        if transport.is_closing():
+            return
+        # judge the client on the backlog it already has, not on this payload
+        if transport.get_write_buffer_size() > MAX_PENDING_BYTES and drop_slow_client(transport):
+            return
+        transport.write(payload)
     except Exception:
         # ignore errors while sending (client may have disconnected)
         pass
 
-def broadcast_line(line, exclude_username=None):
-    """Send line to all connected users except exclude_username (if provided)."""
-    with clients_lock:
-        for uname, meta in list(clients.items()):
-            if uname == exclude_username:
-                continue
-            send_line(meta["conn"], line)
+def drop_slow_client(transport):
+    """
+    Disconnect a client that isn't reading fast enough to keep up with its
+    output. Returns True if it was dropped.
+    """
+    state = transport.get_protocol()
+    if not isinstance(state, ClientState):
+        # the worker relay link is never dropped
+        return False
+    # abort rather than close: close() would wait for a reader that has stopped
+    # to drain its backlog, keeping the socket and that backlog alive. No error
+    # reply is sent, since it could only be queued behind the same backlog.
+    cleanup_connection(state, abort=True)
+    return True
+
+def hub_send(payload):
+    """Pass a newline-terminated line to the other workers, if running with --workers."""
+    if _hub is not None:
+        send_bytes(_hub, payload)
+
+def _publish_clients():
+    global _clients_snapshot, _who_payload
+    _clients_snapshot = tuple(clients.items())
+    _who_payload = None
+
+def schedule_idle_check(state):
+    slot = int(state.last_active + IDLE_TIMEOUT) % WHEEL_SIZE
+    state.wheel_slot = slot
+    _wheel[slot].add(state)
+
+def add_client(username, state):
+    state.username = username
+    state.last_active = now()
+    schedule_idle_check(state)
+    clients[username] = state
+    _publish_clients()
+    hub_send(b"J %s\n" % username)
+
+def remove_client(state):
+    """Remove state's login, if it still holds one. Returns True if it did."""
+    if state.username is None or clients.get(state.username) is not state:
+        return False
+    del clients[state.username]
+    _wheel[state.wheel_slot].discard(state)
+    _publish_clients()
+    hub_send(b"L %s\n" % state.username)
+    return True
 
-def handle_login(raw, conn, addr):
+def broadcast_line(payload, exclude_username=None, relay=True):
+    """
+    Send a newline-terminated line to all connected users except
+    exclude_username (if provided). Also passed on to the other workers
+    unless relay is False.
+    """
+    # built once by the caller; every recipient's transport queues this same object
+    for uname, state in _clients_snapshot:
+        if uname == exclude_username:
+            continue
+        send_bytes(state.transport, payload)
+    if relay:
+        hub_send(b"B " + payload)
+
+def valid_username(username):
+    """
+    A username must be valid UTF-8 with no whitespace or control characters,
+    so it is always a single word in DM targets and USER/MSG lines.
+    """
+    try:
+        name = username.decode('utf-8')
+    except UnicodeDecodeError:
+        return False
+    # isprintable() rejects every separator and control character except " "
+    return name.isprintable() and " " not in name
+
+def handle_login(raw, state):
     """
     Attempt to parse and perform login.
     Returns (username, error_message) where username or error_message is set.
     """
-    raw = raw.strip()
-    parts = raw.split()
-    if len(parts) >= 2 and parts[0].upper() == "LOGIN":
-        username = " ".join(parts[1:]).strip()
-        if not username:
-            return (None, "ERR invalid-username")
-        # ensure username not taken
-        with clients_lock:
-            if username in clients:
-                return (None, "ERR username-taken")
-            # reserve socket temporarily by assigning
-            clients[username] = {"conn": conn, "addr": addr, "last_active": now()}
-            conn_to_username[conn.fileno()] = username
-        return (username, None)
-    else:
-        return (None, "ERR expected-login")
+    head, sep, rest = raw.strip().partition(b" ")
+    if not sep or head.upper() != b"LOGIN":
+        return (None, b"ERR expected-login\n")
+    username = rest.strip()
+    if not username or not valid_username(username):
+        return (None, b"ERR invalid-username\n")
+    # ensure username not taken
+    if username in clients or username in remote_users:
+        return (None, b"ERR username-taken\n")
+    add_client(username, state)
+    return (username, None)
 
-def cleanup_connection(conn):
-    """Close socket and remove mappings. Broadcast disconnect if a logged-in user."""
-    try:
-        fileno = conn.fileno()
-    except Exception:
-        fileno = None
-
-    username = None
-    with clients_lock:
-        if fileno in conn_to_username:
-            username = conn_to_username.pop(fileno)
-        if username and username in clients:
-            # remove client
-            try:
-                clients.pop(username)
-            except KeyError:
-                pass
+def cleanup_connection(state, abort=False):
+    """
+    Close socket and remove mappings. Broadcast disconnect if a logged-in user.
+    abort=True discards unsent output instead of waiting for it to flush.
+    """
+    removed = remove_client(state)
 
     try:
-        conn.close()
+        if abort:
+            state.transport.abort()
+        else:
+            state.transport.close()
     except Exception:
         pass
 
-    if username:
-        broadcast_line(f"INFO {username} disconnected")
+    if removed:
+        broadcast_line(b"INFO %s disconnected\n" % state.username)
 
 def parse_command(line):
-    """Return (cmd, rest) where cmd is uppercased first word, rest is remainder (stripped)."""
+    """
+    Return (cmd, rest) for a raw line. cmd is the uppercased first word,
+    ready to look up in HANDLERS; rest is the stripped remainder.
+    """
+    # strip() hands back the same object when there is nothing to strip, and
+    # also drops the \r of a CRLF line ending
     line = line.strip()
     if not line:
-        return (None, "")
-    parts = line.split(maxsplit=1)
-    cmd = parts[0].upper()
-    rest = parts[1] if len(parts) > 1 else ""
-    return (cmd, rest.strip())
+        return (None, b"")
+    head, _, rest = line.partition(b" ")
+    return (head.upper(), rest.lstrip())
+
+# Command handlers: handler(state, rest) where rest is the argument bytes
 
-def client_thread(conn, addr):
+def handle_msg(state, rest):
+    # rest is the text, forwarded as typed (parse_command already stripped the ends)
+    broadcast_line(b"MSG %s %s\n" % (state.username, rest))
+
+def handle_who(state, rest):
+    # respond with USER <username> per line to the requester only. The reply
+    # only changes on login/disconnect, so it is built once and reused.
+    global _who_payload
+    if _who_payload is None:
+        names = [uname for uname, _ in _clients_snapshot]
+        names.extend(remote_users)
+        _who_payload = b"".join(b"USER %s\n" % uname for uname in names)
+    send_bytes(state.transport, _who_payload)
+
+def handle_dm(state, rest):
+    # DM <username> <text>
+    parts = rest.split(None, 1)
+    if len(parts) < 2:
+        send_bytes(state.transport, b"ERR invalid-dm-format\n")
+        return
+    target, text = parts[0], parts[1]
+    if target in clients:
+        send_bytes(clients[target].transport, b"DM %s %s\n" % (state.username, text))
+    elif target in remote_users:
+        hub_send(b"D %s DM %s %s\n" % (target, state.username, text))
+    else:
+        send_bytes(state.transport, b"ERR user-not-found\n")
+
+def handle_ping(state, rest):
+    send_bytes(state.transport, b"PONG\n")
+
+def handle_unknown(state, rest):
+    send_bytes(state.transport, b"ERR unknown-command\n")
+
+HANDLERS = {
+    b"MSG": handle_msg,
+    b"WHO": handle_who,
+    b"DM": handle_dm,
+    b"PING": handle_ping,
+}
+
+class ClientState(asyncio.BufferedProtocol):
     """
-    Handle a single client connection.
+    Per-connection state. Also the protocol the event loop calls back into
+    whenever the connection's socket is readable (epoll/kqueue readiness).
     Enforces that first successful command is LOGIN <username>.
     Then accepts MSG, WHO, DM, PING.
     """
-    try:
-        conn.settimeout(None)
-        buffer = ""
-        logged_in = False
-        username = None
-        fileno = conn.fileno()
-
-        # First read must be LOGIN
-        # We'll loop receiving until client logs in or disconnects
-        while True:
-            data = conn.recv(4096)
-            if not data:
-                # disconnected before login
-                cleanup_connection(conn)
+
+    __slots__ = ("transport", "addr", "buf", "r", "w", "discarding", "username", "last_active",
+                 "wheel_slot")
+
+    def __init__(self):
+        # received bytes live in buf[r:w]; the loop recv_into()s straight into buf[w:]
+        self.buf = bytearray(RECV_BUFFER_SIZE)
+        self.reset()
+
+    def reset(self):
+        """Forget the previous connection, keeping buf for the next one."""
+        self.transport = None
+        self.addr = None
+        if len(self.buf) > RECV_BUFFER_SIZE:
+            # grown for an oversized line; don't keep that around in the pool
+            self.buf = bytearray(RECV_BUFFER_SIZE)
+        self.r = 0
+        self.w = 0
+        # True while skipping the rest of a line longer than MAX_LINE
+        self.discarding = False
+        self.username = None
+        self.last_active = now()
+        self.wheel_slot = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info("peername")
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            tune_socket(sock)
+        print(f"[+] New connection from {self.addr}")
+
+    def get_buffer(self, sizehint):
+        if self.w == len(self.buf):
+            if self.r:
+                self.compact()
+            else:
+                # a single line fills the whole buffer; make room for the rest of
+                # it, up to MAX_LINE (buffer_updated rejects anything longer)
+                self.rebuffer(max(len(self.buf), min(2 * len(self.buf), MAX_LINE + 1)))
+        return memoryview(self.buf)[self.w:]
+
+    def buffer_updated(self, nbytes):
+        self.w += nbytes
+        if self.discarding:
+            idx = self.buf.find(b"\n", self.r, self.w)
+            if idx < 0:
+                self.r = self.w = 0
                 return
-            buffer += data.decode('utf-8', errors='ignore')
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                u, err = handle_login(line, conn, addr)
-                if err:
-                    send_line(conn, err)
-                    # if an ERR username-taken, close connection
-                    if err.startswith("ERR username-taken"):
-                        cleanup_connection(conn)
-                        return
-                    # otherwise keep waiting for LOGIN
-                else:
-                    username = u
-                    logged_in = True
-                    send_line(conn, "OK")
-                    # broadcast nothing for initial login (spec doesn't require INFO)
-                    with clients_lock:
-                        # update last_active
-                        clients[username]["last_active"] = now()
-                    break
-            if logged_in:
+            self.r = idx + 1
+            self.discarding = False
+        # Process all full lines
+        while True:
+            idx = self.buf.find(b"\n", self.r, self.w)
+            if idx < 0:
                 break
+            line = bytes(memoryview(self.buf)[self.r:idx])
+            self.r = idx + 1
+            try:
+                self.on_line(line)
+            except Exception:
+                # show traceback on server console, then cleanup
+                traceback.print_exc()
+                cleanup_connection(self)
+                return
+            if self.transport.is_closing():
+                return
+        if self.w - self.r > MAX_LINE:
+            # no newline in sight: reject the line and skip ahead to the next one
+            send_bytes(self.transport, b"ERR line-too-long\n")
+            self.discarding = True
+            self.r = self.w = 0
+        if self.r == self.w:
+            self.r = self.w = 0
+        elif self.r > COMPACT_THRESHOLD:
+            # only a partial line is left, so this is a short move that keeps
+            # most of the buffer free for the next recv_into
+            self.compact()
+        if BUFFER_RELAX and len(self.buf) > RECV_BUFFER_SIZE and self.w - self.r < RECV_BUFFER_SIZE // 2:
+            self.shrink()
 
-        # After login, enter message loop
-        while True:
-            data = conn.recv(4096)
-            if not data:
-                # client disconnected
-                cleanup_connection(conn)
+    def compact(self):
+        """Move the unparsed tail buf[r:w] to the front of buf."""
+        n = self.w - self.r
+        self.buf[:n] = self.buf[self.r:self.w]
+        self.r = 0
+        self.w = n
+
+    def shrink(self):
+        """Swap a grown buffer for a RECV_BUFFER_SIZE one holding the unparsed tail."""
+        self.rebuffer(RECV_BUFFER_SIZE)
+
+    def rebuffer(self, size):
+        """Move the unparsed tail buf[r:w] to the front of a new buffer of size bytes."""
+        # a new bytearray rather than resizing in place: the loop may still hold
+        # a view of the old one (the proactor transport does, between get_buffer calls)
+        n = self.w - self.r
+        buf = bytearray(size)
+        buf[:n] = self.buf[self.r:self.w]
+        self.buf = buf
+        self.r = 0
+        self.w = n
+
+    def connection_lost(self, exc):
+        cleanup_connection(self)
+        release_state(self)
+
+    def on_line(self, line):
+        if self.username is None:
+            # First command must be LOGIN
+            line = line.strip()
+            if not line:
                 return
-            buffer += data.decode('utf-8', errors='ignore')
-            # Process all full lines
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                cmd, rest = parse_command(line)
-                # update last active
-                with clients_lock:
-                    if username in clients:
-                        clients[username]["last_active"] = now()
-
-                if cmd == "MSG":
-                    # rest is text
-                    text = " ".join(rest.split())  # normalize spaces
-                    broadcast_line(f"MSG {username} {text}")
-                elif cmd == "WHO":
-                    # respond with USER <username> per line to the requester only
-                    with clients_lock:
-                        for uname in clients.keys():
-                            send_line(conn, f"USER {uname}")
-                elif cmd == "DM":
-                    # DM <username> <text>
-                    parts = rest.split(maxsplit=1)
-                    if len(parts) < 2:
-                        send_line(conn, "ERR invalid-dm-format")
-                    else:
-                        target, text = parts[0], parts[1]
-                        with clients_lock:
-                            if target in clients:
-                                send_line(clients[target]["conn"], f"DM {username} {text}")
-                            else:
-                                send_line(conn, "ERR user-not-found")
-                elif cmd == "PING":
-                    send_line(conn, "PONG")
-                else:
-                    send_line(conn, "ERR unknown-command")
-    except ConnectionResetError:
-        cleanup_connection(conn)
-    except Exception:
-        # show traceback on server console, then cleanup
-        traceback.print_exc()
-        cleanup_connection(conn)
+            _, err = handle_login(line, self)
+            if err:
+                send_bytes(self.transport, err)
+                # if an ERR username-taken, close connection
+                if err == b"ERR username-taken\n":
+                    cleanup_connection(self)
+                # otherwise keep waiting for LOGIN
+            else:
+                send_bytes(self.transport, b"OK\n")
+                # broadcast nothing for initial login (spec doesn't require INFO)
+            return
+
+        cmd, rest = parse_command(line)
+        if cmd is None:
+            return
+        # update last active
+        self.last_active = now()
+        HANDLERS.get(cmd, handle_unknown)(self, rest)
+
+def acquire_state():
+    """Protocol factory for the server: reuse a pooled ClientState if there is one."""
+    if _state_pool:
+        return _state_pool.pop()
+    return ClientState()
 
-def idle_reaper_thread():
-    """Disconnect clients that have been idle for > IDLE_TIMEOUT seconds."""
+def release_state(state):
+    """Return a closed connection's state to the pool."""
+    state.reset()
+    if len(_state_pool) < STATE_POOL_SIZE:
+        _state_pool.append(state)
+
+async def idle_reaper():
+    """
+    Disconnect clients that have been idle for > IDLE_TIMEOUT seconds.
+    Each tick only looks at the wheel slots for the seconds that just passed.
+    """
+    cursor = int(now())
     while True:
-        time.sleep(5)
-        nowt = now()
-        to_disconnect = []
-        with clients_lock:
-            for uname, meta in list(clients.items()):
-                if nowt - meta["last_active"] > IDLE_TIMEOUT:
-                    to_disconnect.append(uname)
-        for uname in to_disconnect:
-            with clients_lock:
-                meta = clients.get(uname)
-                if not meta:
-                    continue
-                conn = meta["conn"]
-                # send a message then close
-                try:
-                    send_line(conn, "INFO disconnected-due-to-inactivity")
-                except Exception:
-                    pass
-                try:
-                    fileno = conn.fileno()
-                except Exception:
-                    fileno = None
-                # remove mappings
-                if fileno in conn_to_username:
-                    conn_to_username.pop(fileno, None)
-                clients.pop(uname, None)
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-            broadcast_line(f"INFO {uname} disconnected")
-
-def start_server(host, port):
-    # Start idle reaper thread
-    reaper = threading.Thread(target=idle_reaper_thread, daemon=True)
-    reaper.start()
-
-    # Create server socket
-    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    srv.bind((host, port))
-    srv.listen(50)
+        await asyncio.sleep(1)
+        tick = int(now())
+        # if the loop stalled for more than a full turn, one pass over the wheel covers it
+        cursor = max(cursor, tick - WHEEL_SIZE)
+        while cursor < tick:
+            expire_slot(cursor % WHEEL_SIZE)
+            cursor += 1
+
+def expire_slot(slot):
+    due = _wheel[slot]
+    _wheel[slot] = set()
+    nowt = now()
+    for state in due:
+        if clients.get(state.username) is not state:
+            # logged out while this slot was being walked (e.g. dropped by the
+            # INFO broadcast of an earlier expiry); it must not re-enter the wheel
+            continue
+        if nowt - state.last_active > IDLE_TIMEOUT:
+            # send a message then close (close() flushes queued data first)
+            send_bytes(state.transport, b"INFO disconnected-due-to-inactivity\n")
+            cleanup_connection(state)
+        else:
+            schedule_idle_check(state)
+
+def on_hub_line(line):
+    """Apply a line (newline included) relayed from another worker."""
+    global _who_payload
+    kind, _, rest = line.partition(b" ")
+    if kind == b"B":
+        # broadcast from another worker: deliver locally only
+        broadcast_line(rest, relay=False)
+    elif kind == b"J":
+        remote_users.add(rest[:-1])
+        _who_payload = None
+    elif kind == b"L":
+        remote_users.discard(rest[:-1])
+        _who_payload = None
+    elif kind == b"D":
+        target, _, payload = rest.partition(b" ")
+        state = clients.get(target)
+        if state is not None:
+            send_bytes(state.transport, payload)
+
+class HubLink(asyncio.Protocol):
+    """A worker's connection to the parent's relay."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        global _hub
+        _hub = transport
+
+    def data_received(self, data):
+        self.buf += data
+        while True:
+            idx = self.buf.find(b"\n")
+            if idx < 0:
+                break
+            line = bytes(self.buf[:idx + 1])
+            del self.buf[:idx + 1]
+            on_hub_line(line)
+
+    def connection_lost(self, exc):
+        global _hub, _who_payload
+        _hub = None
+        remote_users.clear()
+        _who_payload = None
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+async def main(host, port, hub_sock=None):
+    loop = asyncio.get_running_loop()
+    # Start idle reaper task
+    reaper = asyncio.create_task(idle_reaper())
+
+    link = None
+    if hub_sock is not None:
+        # connect to the relay before accepting anyone, so no login's J line is lost
+        _, link = await loop.connect_accepted_socket(HubLink, hub_sock)
+
+    # only --workers shares the port (SO_REUSEPORT); a lone server keeps an
+    # exclusive bind so a second copy fails instead of splitting the room
+    srv = await loop.create_server(acquire_state, host, port, backlog=512,
+                                   reuse_port=hub_sock is not None)
     print(f"[+] Chat server listening on {host}:{port}")
     try:
-        while True:
-            conn, addr = srv.accept()
-            print(f"[+] New connection from {addr}")
-            t = threading.Thread(target=client_thread, args=(conn, addr), daemon=True)
-            t.start()
-    except KeyboardInterrupt:
-        print("[*] Shutting down server.")
+        async with srv:
+            if link is None:
+                await srv.serve_forever()
+            else:
+                # a worker stops serving once the parent goes away
+                await link.closed
     finally:
+        reaper.cancel()
+
+async def run_hub(socks):
+    """
+    Parent side of --workers: relay every line a worker sends to all other
+    workers. Remembers who is logged in on each worker so their logins can
+    be dropped everywhere if that worker exits.
+    """
+    links = []
+    for sock in socks:
+        reader, writer = await asyncio.open_connection(sock=sock, limit=HUB_LINE_LIMIT)
+        links.append((reader, writer, set()))
+
+    def relay(line, source):
+        for _, writer, _ in links:
+            if writer is not source:
+                writer.write(line)
+
+    async def pump(link):
+        reader, writer, users = link
         try:
-            srv.close()
-        except Exception:
+            while True:
+                line = await reader.readline()
+                if not line.endswith(b"\n"):
+                    break
+                if line.startswith(b"J "):
+                    users.add(line[2:-1])
+                elif line.startswith(b"L "):
+                    users.discard(line[2:-1])
+                relay(line, writer)
+        except ConnectionError:
             pass
+        except Exception:
+            # a bad link only ends itself; the other workers keep relaying
+            traceback.print_exc()
+        finally:
+            links.remove(link)
+            for uname in users:
+                # tell the other workers' clients too, as for a normal disconnect
+                relay(b"L " + uname + b"\n", writer)
+                relay(b"B INFO " + uname + b" disconnected\n", writer)
+            writer.close()
+
+    async def reaper():
+        # reap workers as they exit so a dead one doesn't linger as a zombie
+        # (polled: uvloop reserves SIGCHLD for itself)
+        while True:
+            await asyncio.sleep(1)
+            reap_workers()
+
+    reaper_task = asyncio.create_task(reaper())
+    try:
+        await asyncio.gather(*(pump(link) for link in list(links)))
+    finally:
+        reaper_task.cancel()
+
+def reap_workers(block=False):
+    """Collect exited worker processes, reporting any that failed."""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        code = os.waitstatus_to_exitcode(status) if hasattr(os, "waitstatus_to_exitcode") else status
+        if code != 0:
+            print(f"[!] Worker {pid} exited with status {code}")
+
+def run(coro):
+    """asyncio.run, on uvloop's event loop when it is available."""
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+def run_workers(host, port, workers):
+    """Fork workers that all serve host:port, then relay between them until they exit."""
+    socks = []
+    for _ in range(workers):
+        parent_end, child_end = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            parent_end.close()
+            for sock in socks:
+                sock.close()
+            code = 0
+            try:
+                run(main(host, port, child_end))
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        child_end.close()
+        socks.append(parent_end)
+    try:
+        run(run_hub(socks))
+    finally:
+        for sock in socks:
+            sock.close()
+        reap_workers(block=True)
+    # the relay only returns once every worker has gone
+    print("[!] All workers exited.")
+    sys.exit(1)
+
+def start_server(host, port, workers=1):
+    try:
+        if workers > 1:
+            run_workers(host, port, workers)
+        else:
+            run(main(host, port))
+    except KeyboardInterrupt:
+        print("[*] Shutting down server.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simple Socket Chat Server")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to (default 0.0.0.0)")
     parser.add_argument("--port", type=int, default=int(os.environ.get("CHAT_PORT", DEFAULT_PORT)),
                         help=f"Port to bind to (default env CHAT_PORT or {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of server processes sharing the port (default 1)")
     args = parser.parse_args()
-    start_server(args.host, args.port)
+    if args.workers > 1 and not (hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")):
+        parser.error("--workers needs os.fork and SO_REUSEPORT, which this platform lacks")
+    start_server(args.host, args.port, args.workers)